@@ -1,17 +1,67 @@
 #!/usr/bin/env python3
+import base64
+import functools
+import hashlib
+import http.client
 import socket
 import json
 import struct
 import os
+import re
+import selectors
+import shelve
 import subprocess
+import threading
 import time
+import unicodedata
 import uuid
-import urllib.error
-import urllib.request
 import urllib.parse
-from typing import Optional, Dict, Any, Tuple, Union
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, Tuple, Union, Callable, Iterator, TypeVar
 from dataclasses import dataclass
-from email.message import Message
+
+try:
+    import orjson
+
+    _dumps: Callable[[Any], bytes] = orjson.dumps
+    _loads: Callable[[Union[bytes, str]], Any] = orjson.loads
+except ImportError:
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode(
+            "utf-8"
+        )
+
+    _loads = json.loads
+
+
+def _cache_dir() -> str:
+    """Get the per-user cache directory for this application"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "apple-music-discord")
+
+
+LOOKUP_CACHE_PATH = os.path.join(_cache_dir(), "lookups")
+IPC_PATH_CACHE_PATH = os.path.join(_cache_dir(), "ipc-path")
+
+# Seconds before a cached artwork or track URL lookup is refreshed
+LOOKUP_CACHE_TTL = 30 * 24 * 60 * 60
+
+# Seconds between polls while idle or waiting on lookups, and the longest
+# sleep during steady playback (bounds how late pauses and skips are noticed)
+POLL_INTERVAL = 1.0
+POLL_HEARTBEAT = 15.0
+
+# Drift in seconds between predicted and reported position treated as a seek
+SEEK_TOLERANCE = 2.0
+
+# Keep-alive HTTPS connections, one set per worker thread
+_http_local = threading.local()
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -39,7 +89,52 @@ class SongData:
             raise ValueError("Artist cannot be empty")
 
 
+def _load_ipc_path() -> Optional[str]:
+    """Get the socket path that worked last time, if any"""
+    try:
+        with open(IPC_PATH_CACHE_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _ipc_socket_paths(tmpdir: str, cached_path: Optional[str]) -> Iterator[str]:
+    """Yield Discord IPC socket paths, starting with the cached one"""
+    if cached_path:
+        yield cached_path
+
+    # One directory listing instead of probing each numbered socket
+    try:
+        names = os.listdir(tmpdir)
+    except OSError:
+        return
+
+    candidates = sorted(
+        (n for n in names if n.startswith("discord-ipc-") and n[12:].isdigit()),
+        key=lambda n: int(n[12:]),
+    )
+    for name in candidates:
+        socket_path = os.path.join(tmpdir, name)
+        if socket_path != cached_path:
+            yield socket_path
+
+
+def _save_ipc_path(socket_path: Optional[str]) -> None:
+    """Remember the socket path that worked, or forget it if None"""
+    try:
+        if socket_path is None:
+            os.remove(IPC_PATH_CACHE_PATH)
+        else:
+            os.makedirs(os.path.dirname(IPC_PATH_CACHE_PATH), exist_ok=True)
+            with open(IPC_PATH_CACHE_PATH, "w", encoding="utf-8") as f:
+                f.write(socket_path)
+    except OSError:
+        pass
+
+
 class DiscordRPC:
+    MAX_PACKET_SIZE = 64 * 1024  # Discord replies are well under 1KB
+
     def __init__(self, client_id: str):
         if not client_id or not client_id.strip():
             raise ValueError("Client ID cannot be empty")
@@ -48,28 +143,49 @@ class DiscordRPC:
 
         self.client_id: str = client_id
         self.sock: Optional[socket.socket] = None
+        self._sel: Optional[selectors.BaseSelector] = None
+        self._rbuf: bytearray = bytearray(self.MAX_PACKET_SIZE)
         self.connected: bool = False
+        self._last_activity_payload: Optional[bytes] = None
+
+        # Everything in a SET_ACTIVITY command except the activity and nonce
+        self._activity_prefix: bytes = (
+            b'{"cmd":"SET_ACTIVITY","args":{"pid":%d,"activity":' % os.getpid()
+        )
 
     def connect(self) -> bool:
         """Connect to Discord IPC"""
         if self.connected:
             return True
 
+        self._last_activity_payload = None
         tmpdir = os.environ.get("TMPDIR", "/tmp/")
 
         if not os.path.exists(tmpdir):
             return False
 
-        for i in range(10):
+        cached_path = _load_ipc_path()
+        for socket_path in _ipc_socket_paths(tmpdir, cached_path):
             try:
-                socket_path = os.path.join(tmpdir, f"discord-ipc-{i}")
-                if not os.path.exists(socket_path):
-                    continue
-
                 self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+                # Room for a whole packet in one send or recv. TCP_NODELAY has
+                # no AF_UNIX equivalent; Unix sockets never delay small writes.
+                try:
+                    for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+                        self.sock.setsockopt(
+                            socket.SOL_SOCKET, option, self.MAX_PACKET_SIZE
+                        )
+                except OSError:
+                    pass
+
                 self.sock.settimeout(5.0)  # Add timeout
                 self.sock.connect(socket_path)
 
+                # Only read once Discord has sent something
+                self._sel = selectors.DefaultSelector()
+                self._sel.register(self.sock, selectors.EVENT_READ)
+
                 # Send handshake
                 handshake: Dict[str, Union[int, str]] = {
                     "v": 1,
@@ -78,28 +194,22 @@ class DiscordRPC:
                 self._send_packet(0, handshake)
 
                 # Read response
-                _, response = self._read_packet()
+                _, response = self._read_packet(timeout=5.0)
                 if response and response.get("evt") == "READY":
                     self.connected = True
+                    if socket_path != cached_path:
+                        _save_ipc_path(socket_path)
                     return True
 
             except (OSError, socket.error, json.JSONDecodeError, struct.error):
-                if self.sock:
-                    try:
-                        self.sock.close()
-                    except:
-                        pass
-                    self.sock = None
+                self.close()
                 continue
             except Exception:
-                if self.sock:
-                    try:
-                        self.sock.close()
-                    except:
-                        pass
-                    self.sock = None
+                self.close()
                 continue
 
+        if cached_path:
+            _save_ipc_path(None)
         return False
 
     def _send_packet(self, opcode: int, data: Dict[str, Any]) -> None:
@@ -109,35 +219,77 @@ class DiscordRPC:
         if opcode < 0:
             raise ValueError("Opcode must be a non-negative integer")
 
+        self._send_packet_raw(opcode, _dumps(data))
+
+    def _send_packet_raw(self, opcode: int, json_data: bytes) -> None:
+        """Send an already serialized Discord IPC packet"""
+        if not self.sock:
+            raise RuntimeError("Socket not connected")
+
         try:
-            json_data = json.dumps(data).encode("utf-8")
             header = struct.pack("<II", opcode, len(json_data))
-            self.sock.send(header + json_data)
+
+            # Scatter-gather avoids concatenating header and body
+            sent = self.sock.sendmsg([header, json_data])
+            if sent < len(header) + len(json_data):
+                self.sock.sendall((header + json_data)[sent:])
         except (struct.error, OSError) as e:
             raise RuntimeError(f"Failed to send packet: {e}")
 
-    def _read_packet(self) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
-        """Read a Discord IPC packet"""
-        if not self.sock:
+    def _recv_exact(self, size: int) -> Optional[memoryview]:
+        """Receive exactly size bytes into the read buffer, or None if closed"""
+        if not self.sock or size > len(self._rbuf):
+            return None
+
+        view = memoryview(self._rbuf)[:size]
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if count == 0:
+                return None
+            received += count
+
+        return view
+
+    def _read_packet(
+        self, timeout: float
+    ) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """Read a Discord IPC packet if one arrives within the timeout"""
+        if not self.sock or not self._sel:
             return None, None
 
         try:
-            header = self.sock.recv(8)
-            if len(header) < 8:
+            if not self._sel.select(timeout=timeout):
+                return None, None
+
+            if self._recv_exact(8) is None:
+                self.close()
                 return None, None
 
-            opcode, length = struct.unpack("<II", header)
+            opcode, length = struct.unpack_from("<II", self._rbuf)
 
-            # Validate packet length
-            if length > 1024 * 1024:  # 1MB limit
-                raise ValueError("Packet too large")
+            # Validate packet length; an oversized one means the stream is out of sync
+            if length > self.MAX_PACKET_SIZE:
+                print(
+                    f"Discord sent an oversized packet ({length} bytes), disconnecting"
+                )
+                self.close()
+                return None, None
             if length <= 0:
                 raise ValueError("Invalid packet length")
 
-            data = self.sock.recv(length).decode("utf-8")
-            return opcode, json.loads(data)
+            data = self._recv_exact(length)
+            if data is None:
+                self.close()
+                return None, None
+
+            return opcode, _loads(bytes(data))
 
-        except (struct.error, json.JSONDecodeError, UnicodeDecodeError, OSError):
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None, None
+        except (struct.error, ValueError, OSError):
+            # Connection dropped or the stream is out of sync
+            self.close()
             return None, None
 
     def set_activity(self, activity: Optional[Dict[str, Any]] = None) -> bool:
@@ -145,27 +297,46 @@ class DiscordRPC:
         if not self.connected or not self.sock:
             return False
 
-        try:
-            command: Dict[str, Any] = {
-                "cmd": "SET_ACTIVITY",
-                "nonce": str(uuid.uuid4()),
-                "args": {"pid": os.getpid(), "activity": activity},
-            }
-
-            self._send_packet(1, command)  # FRAME opcode
+        # Skip the round-trip if Discord already shows this activity
+        payload = _dumps(activity)
+        if payload == self._last_activity_payload:
+            return True
 
-            # Read Discord's response
-            _, response = self._read_packet()
+        try:
+            # Splice the activity into the preserialized command
+            nonce = str(uuid.uuid4()).encode()
+            command = b"".join(
+                (self._activity_prefix, payload, b'},"nonce":"', nonce, b'"}')
+            )
 
-            if response and response.get("evt") == "ERROR":
-                return False
+            # Discord's reply is picked up later by drain_pending()
+            self._send_packet_raw(1, command)  # FRAME opcode
 
+            self._last_activity_payload = payload
             return True
         except Exception:
             return False
 
+    def drain_pending(self) -> None:
+        """Read any replies Discord has already sent, logging errors"""
+        while self.connected:
+            _, response = self._read_packet(timeout=0)
+            if response is None:
+                break
+
+            if response.get("evt") == "ERROR":
+                print(f"Discord rejected activity: {response.get('data')}")
+                # Resend on the next update rather than trusting the skip check
+                self._last_activity_payload = None
+
     def close(self) -> None:
         """Close Discord connection"""
+        if self._sel:
+            try:
+                self._sel.close()
+            except:
+                pass
+            self._sel = None
         if self.sock:
             try:
                 self.sock.close()
@@ -173,8 +344,213 @@ class DiscordRPC:
                 pass
             self.sock = None
         self.connected = False
+        self._last_activity_payload = None
+
+
+class LookupCache:
+    """Persistent cache of network lookups, mirrored in memory"""
+
+    def __init__(self, path: str, ttl: float):
+        self.path: str = path
+        self.ttl: float = ttl
+        self._entries: Optional[Dict[str, Tuple[Any, float]]] = None
+        self._persist: bool = True
+        self._lock = threading.Lock()
+
+    def _open(self) -> Dict[str, Tuple[Any, float]]:
+        """Load every unexpired entry from disk into memory"""
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            # The shelf is opened per operation rather than kept open: lookups
+            # are stored from worker threads, and dbm.sqlite3 connections
+            # cannot be used outside the thread that opened them
+            with shelve.open(self.path) as shelf:
+                now = time.time()
+                expired = []
+                for key, (value, stored_at) in shelf.items():
+                    if now - stored_at < self.ttl:
+                        self._entries[key] = (value, stored_at)
+                    else:
+                        expired.append(key)
+
+                for key in expired:
+                    del shelf[key]
+        except Exception as e:
+            print(f"Lookup cache unavailable, caching in memory only: {e}")
+            self._persist = False
+
+        return self._entries
+
+    def open(self) -> None:
+        """Load the cache from disk ahead of the first lookup"""
+        with self._lock:
+            self._open()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value if it has not expired"""
+        with self._lock:
+            entry = self._open().get(key)
+
+        if entry is None or time.time() - entry[1] >= self.ttl:
+            return None
+
+        return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value in memory and on disk"""
+        entry = (value, time.time())
+        with self._lock:
+            self._open()[key] = entry
+            if not self._persist:
+                return
+
+            try:
+                with shelve.open(self.path) as shelf:
+                    shelf[key] = entry
+            except Exception as e:
+                print(f"Failed to write lookup cache: {e}")
+
+    def close(self) -> None:
+        """Stop writing to disk, waiting for any write in progress"""
+        with self._lock:
+            self._persist = False
+
+
+_lookup_cache = LookupCache(LOOKUP_CACHE_PATH, LOOKUP_CACHE_TTL)
+
+
+def _persistent_cache(
+    prefix: str, identity: Callable[[str, str, str], Optional[str]]
+) -> Callable[
+    [Callable[[str, str, str], Optional[T]]], Callable[[str, str, str], Optional[T]]
+]:
+    """Cache successful lookups in the shared lookup cache under a key prefix"""
+
+    def decorator(
+        func: Callable[[str, str, str], Optional[T]],
+    ) -> Callable[[str, str, str], Optional[T]]:
+        @functools.wraps(func)
+        def wrapper(artist: str, title: str, album: str) -> Optional[T]:
+            ident = identity(artist, title, album)
+            if ident is None:
+                return func(artist, title, album)
+
+            key = f"{prefix}:{hashlib.sha1(ident.encode()).hexdigest()}"
+            cached = _lookup_cache.get(key)
+            if cached:
+                return cached
+
+            value = func(artist, title, album)
+            if value:
+                _lookup_cache.set(key, value)
+
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def _album_identity(artist: str, title: str, album: str) -> Optional[str]:
+    """Identify a song's album for artwork lookups"""
+    # Artwork is per-album, so without an album there is nothing to key on
+    return f"{artist}\0{album}" if album.strip() else None
+
+
+def _track_identity(artist: str, title: str, album: str) -> Optional[str]:
+    """Identify a song for track URL lookups"""
+    return f"{artist}\0{title}"
+
+
+def _https_connection(host: str, timeout: float) -> http.client.HTTPSConnection:
+    """Open an HTTPS connection, tunnelling through the configured proxy if any"""
+    # Same proxy settings urlopen would use, including macOS system settings
+    proxy = urllib.request.getproxies().get("https")
+    if not proxy or urllib.request.proxy_bypass(host):
+        return http.client.HTTPSConnection(host, timeout=timeout)
+
+    parsed = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    if not parsed.hostname:
+        return http.client.HTTPSConnection(host, timeout=timeout)
+
+    headers: Dict[str, str] = {}
+    if parsed.username:
+        username = urllib.parse.unquote(parsed.username)
+        password = urllib.parse.unquote(parsed.password or "")
+        credentials = f"{username}:{password}"
+        token = base64.b64encode(credentials.encode()).decode("ascii")
+        headers["Proxy-Authorization"] = f"Basic {token}"
+
+    conn = http.client.HTTPSConnection(
+        parsed.hostname, parsed.port or 80, timeout=timeout
+    )
+    conn.set_tunnel(host, 443, headers=headers)
+    return conn
+
+
+def _http_get(host: str, path: str, timeout: float = 5) -> Optional[bytes]:
+    """GET a resource over a reused HTTPS connection, returning the body on 200"""
+    connections: Optional[Dict[str, http.client.HTTPSConnection]] = getattr(
+        _http_local, "connections", None
+    )
+    if connections is None:
+        connections = _http_local.connections = {}
+
+    # A kept-alive connection may have been closed by the server; retry once
+    for _ in range(2):
+        reused = host in connections
+        if not reused:
+            connections[host] = _https_connection(host, timeout)
+        conn = connections[host]
+
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            del connections[host]
+            if reused:
+                continue
+            return None
+
+        if response.status != 200:
+            return None
 
+        return body
 
+    return None
+
+
+def _normalize(text: str) -> str:
+    """Normalize text for case- and accent-insensitive comparison"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold().strip())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _quote_query(query: str) -> str:
+    """URL-encode a search query, skipping the quoting machinery for plain text"""
+    if query.isascii() and query.replace(" ", "").isalnum():
+        return query.replace(" ", "+")
+
+    return urllib.parse.quote_plus(query, safe="")
+
+
+def _apple_music_search_url(artist: str, title: str) -> str:
+    """Get an Apple Music search URL for a song"""
+    query = f"{artist} {title}".strip()
+    if query:
+        return f"https://music.apple.com/search?term={_quote_query(query)}"
+
+    return "https://music.apple.com/"
+
+
+@_persistent_cache("art", _album_identity)
 def get_album_artwork(artist: str, title: str, album: str) -> Optional[str]:
     """Get album artwork URL from Deezer API"""
     if not artist.strip() and not title.strip():
@@ -186,32 +562,29 @@ def get_album_artwork(artist: str, title: str, album: str) -> Optional[str]:
         if not query:
             return None
 
-        encoded_query = urllib.parse.quote(query)
+        encoded_query = _quote_query(query)
 
         # Search Deezer API
-        url = f"https://api.deezer.com/search/track?q={encoded_query}&limit=1"
-
-        with urllib.request.urlopen(url, timeout=5) as response:
-            if response.status != 200:
-                return None
+        body = _http_get("api.deezer.com", f"/search/track?q={encoded_query}&limit=1")
+        if body is None:
+            return None
 
-            data = json.loads(response.read().decode())
+        data = _loads(body)
 
-            if data.get("data") and len(data["data"]) > 0:
-                track = data["data"][0]
-                album_info = track.get("album", {})
+        if data.get("data") and len(data["data"]) > 0:
+            track = data["data"][0]
+            album_info = track.get("album", {})
 
-                # Return the largest available cover
-                return (
-                    album_info.get("cover_xl")
-                    or album_info.get("cover_big")
-                    or album_info.get("cover_medium")
-                )
+            # Return the largest available cover
+            return (
+                album_info.get("cover_xl")
+                or album_info.get("cover_big")
+                or album_info.get("cover_medium")
+            )
 
     except (
-        urllib.error.URLError,
-        urllib.error.HTTPError,
         json.JSONDecodeError,
+        UnicodeDecodeError,
         KeyError,
         TimeoutError,
     ):
@@ -222,60 +595,69 @@ def get_album_artwork(artist: str, title: str, album: str) -> Optional[str]:
     return None
 
 
-def get_apple_music_url(artist: str, title: str, album: str) -> str:
-    """Get actual Apple Music song URL using iTunes Search API"""
-    if not artist.strip() and not title.strip():
-        return "https://music.apple.com/"
-
+@_persistent_cache("track", _track_identity)
+def _find_itunes_track(
+    artist: str, title: str, album: str
+) -> Optional[Tuple[str, Optional[str]]]:
+    """Find the Apple Music song URL and artwork using iTunes Search API"""
     try:
         # First try searching with artist and title
         query = f"{title} {artist}".strip()
         if not query:
-            return "https://music.apple.com/"
+            return None
 
-        encoded_query = urllib.parse.quote(query)
+        encoded_query = _quote_query(query)
 
         # Search iTunes API
-        url = f"https://itunes.apple.com/search?term={encoded_query}&media=music&entity=song&limit=5"
-
-        with urllib.request.urlopen(url, timeout=5) as response:
-            msg = Message()
-            if response.status != 200:
-                raise urllib.error.HTTPError(
-                    url,
-                    response.status,
-                    "HTTP Error",
-                    msg,
-                    None,
-                )
+        body = _http_get(
+            "itunes.apple.com",
+            f"/search?term={encoded_query}&media=music&entity=song&limit=3",
+        )
+        data = _loads(body) if body is not None else {}
 
-            data = json.loads(response.read().decode())
-
-            if data.get("results"):
-                # Look for best match based on artist and title similarity
-                for result in data["results"]:
-                    result_artist = result.get("artistName", "").lower()
-                    result_title = result.get("trackName", "").lower()
-
-                    # Check if artist and title match (case insensitive)
-                    if (
-                        artist.lower() in result_artist
-                        or result_artist in artist.lower()
-                    ) and (
-                        title.lower() in result_title or result_title in title.lower()
-                    ):
-                        track_view_url = result.get("trackViewUrl")
-                        if track_view_url and isinstance(track_view_url, str):
-                            # Convert iTunes URL to Apple Music URL
-                            apple_music_url = track_view_url.replace(
-                                "itunes.apple.com", "music.apple.com"
-                            )
-                            return apple_music_url
+        # Normalize the song once rather than per result
+        artist_norm = _normalize(artist)
+        title_norm = _normalize(title)
+        match: Optional[Dict[str, Any]] = None
+
+        # Prefer an exact match, then fall back to substring similarity
+        for result in data.get("results") or []:
+            track_view_url = result.get("trackViewUrl")
+            if not track_view_url or not isinstance(track_view_url, str):
+                continue
+
+            result_artist = _normalize(result.get("artistName", ""))
+            result_title = _normalize(result.get("trackName", ""))
+
+            if result_artist == artist_norm and result_title == title_norm:
+                match = result
+                break
+
+            if (
+                match is None
+                and (artist_norm in result_artist or result_artist in artist_norm)
+                and (title_norm in result_title or result_title in title_norm)
+            ):
+                match = result
+
+        if match:
+            # Convert iTunes URL to Apple Music URL
+            apple_music_url = match["trackViewUrl"].replace(
+                "itunes.apple.com", "music.apple.com"
+            )
+
+            # Same artwork Apple Music shows, scaled up from the thumbnail
+            artwork = match.get("artworkUrl100")
+            if artwork and isinstance(artwork, str):
+                artwork = artwork.replace("100x100", "600x600")
+            else:
+                artwork = None
+
+            return apple_music_url, artwork
 
     except (
-        urllib.error.URLError,
-        urllib.error.HTTPError,
         json.JSONDecodeError,
+        UnicodeDecodeError,
         KeyError,
         TimeoutError,
     ):
@@ -283,18 +665,31 @@ def get_apple_music_url(artist: str, title: str, album: str) -> str:
     except Exception:
         pass
 
-    # Fallback to search URL
-    fallback_query = f"{artist} {title}".strip()
-    if fallback_query:
-        encoded_fallback = urllib.parse.quote(fallback_query)
-        return f"https://music.apple.com/search?term={encoded_fallback}"
+    return None
 
-    return "https://music.apple.com/"
 
+def fetch_song_metadata(
+    artist: str, title: str, album: str
+) -> Tuple[str, Optional[str]]:
+    """Get the Apple Music URL and album artwork for a song"""
+    if not artist.strip() and not title.strip():
+        return "https://music.apple.com/", None
+
+    track = _find_itunes_track(artist, title, album)
+    if track:
+        apple_music_url, artwork = track
+    else:
+        # Fallback to search URL
+        apple_music_url, artwork = _apple_music_search_url(artist, title), None
 
-def get_current_song() -> Optional[SongData]:
-    """Get currently playing song from Apple Music"""
-    applescript = """
+    # Only go to Deezer when iTunes has no artwork
+    if not artwork:
+        artwork = get_album_artwork(artist, title, album)
+
+    return apple_music_url, artwork
+
+
+SONG_APPLESCRIPT = """
    tell application "Music"
        if player state is playing then
            set trackName to name of current track
@@ -314,16 +709,192 @@ def get_current_song() -> Optional[SongData]:
    end tell
    """
 
+
+def _applescript_string(text: str) -> str:
+    """Quote text as a single-line AppleScript string literal"""
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+class AppleScriptSession:
+    """Long-lived interactive osascript process for repeated queries"""
+
+    SENTINEL = b"---END---"
+    MAX_FAILURES = 3
+    RETRY_COOLDOWN = 60.0  # Seconds to rest the session after repeated failures
+
+    def __init__(self, setup: Optional[str] = None):
+        self.setup: Optional[str] = setup
+        self.proc: Optional[subprocess.Popen[bytes]] = None
+        self._sel: Optional[selectors.BaseSelector] = None
+        self._buffer: bytes = b""
+        self.failures: int = 0
+        self.retry_at: float = 0.0
+        self.timed_out: bool = False
+
+    def _start(self) -> bool:
+        """Spawn osascript and run the setup statement"""
+        try:
+            self.proc = subprocess.Popen(
+                ["osascript", "-i"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                bufsize=0,
+            )
+        except OSError:
+            self.proc = None
+            return False
+
+        # Read replies straight from the pipe, in whatever chunks they arrive
+        if not self.proc.stdout:
+            return False
+        os.set_blocking(self.proc.stdout.fileno(), False)
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self.proc.stdout, selectors.EVENT_READ)
+        self._buffer = b""
+
+        if self.setup and self._exchange(self.setup) is None:
+            return False
+
+        return True
+
+    def _exchange(self, statement: str, timeout: float = 10) -> Optional[str]:
+        """Send one statement and return the last result line before the sentinel"""
+        if not self.proc or not self.proc.stdin or not self.proc.stdout:
+            return None
+        if not self._sel:
+            return None
+
+        try:
+            # Statement and sentinel go out in a single write
+            request = f'{statement}\n"{self.SENTINEL.decode()}"\n'.encode("utf-8")
+            self.proc.stdin.write(request)
+
+            stdout_fd = self.proc.stdout.fileno()
+            deadline = time.monotonic() + timeout
+            buffer = self._buffer
+            while self.SENTINEL not in buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Music is hanging; start over with a fresh process
+                    self.timed_out = True
+                    self.close()
+                    return None
+                if not self._sel.select(timeout=remaining):
+                    continue
+
+                chunk = os.read(stdout_fd, 65536)
+                if not chunk:
+                    self.close()
+                    return None
+                buffer += chunk
+        except (OSError, ValueError):
+            self.close()
+            return None
+
+        # Keep anything after the sentinel line for the next exchange
+        sentinel_at = buffer.index(self.SENTINEL)
+        line_start = buffer.rfind(b"\n", 0, sentinel_at) + 1
+        line_end = buffer.find(b"\n", sentinel_at)
+        self._buffer = buffer[line_end + 1 :] if line_end != -1 else b""
+
+        lines = buffer[:line_start].decode("utf-8", errors="replace").splitlines()
+        return lines[-1] if lines else ""
+
+    def query(self, statement: str) -> Optional[str]:
+        """Run a single-line statement and return its result as text"""
+        self.timed_out = False
+
+        # After repeated failures, rest the session before trying again
+        if self.failures >= self.MAX_FAILURES:
+            if time.monotonic() < self.retry_at:
+                return None
+            self.failures = 0
+
+        # Restart the process if it exited since the last query
+        if not self.proc or self.proc.poll() is not None:
+            self.close()
+            if not self._start():
+                self._record_failure()
+                self.close()
+                return None
+
+        line = self._exchange(statement)
+        if line is None:
+            self._record_failure()
+            return None
+        self.failures = 0
+
+        # Results are echoed as AppleScript literals, e.g. => "text"
+        start = line.find('"')
+        end = line.rfind('"')
+        if start == -1 or end <= start:
+            return line.strip()
+
+        return re.sub(r"\\(.)", r"\1", line[start + 1 : end])
+
+    def _record_failure(self) -> None:
+        """Count a failed query, starting the cooldown once there are too many"""
+        self.failures += 1
+        if self.failures >= self.MAX_FAILURES:
+            self.retry_at = time.monotonic() + self.RETRY_COOLDOWN
+
+    def close(self) -> None:
+        """Terminate the osascript process"""
+        if self._sel:
+            try:
+                self._sel.close()
+            except OSError:
+                pass
+            self._sel = None
+        if self.proc:
+            try:
+                if self.proc.stdin:
+                    self.proc.stdin.close()
+                self.proc.terminate()
+                self.proc.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+            if self.proc.stdout:
+                self.proc.stdout.close()
+            self.proc = None
+        self._buffer = b""
+
+
+def song_session() -> AppleScriptSession:
+    """Create a session with the song query compiled once as a script object"""
+    script = f"script\non run\n{SONG_APPLESCRIPT}\nend run\nend script"
+    return AppleScriptSession(
+        f"set songQuery to run script {_applescript_string(script)}"
+    )
+
+
+# Title, artist, album, duration, position and URL as reported by Apple Music
+RawSong = Tuple[str, str, str, float, float, str]
+
+
+def _raw_song(session: Optional[AppleScriptSession] = None) -> Optional[RawSong]:
+    """Get currently playing song from Apple Music without validating it"""
     try:
-        result = subprocess.run(
-            ["osascript", "-e", applescript],
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=10,  # Add timeout
-        )
+        output = session.query("run songQuery") if session else None
+
+        # A hung Music would hang a one-off osascript too; wait for the next poll
+        if output is None and session and session.timed_out:
+            return None
 
-        output = result.stdout.strip()
+        # Fall back to a one-off osascript if there is no usable session
+        if output is None:
+            result = subprocess.run(
+                ["osascript", "-e", SONG_APPLESCRIPT],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=10,  # Add timeout
+            )
+            output = result.stdout
+
+        output = output.strip()
         if not output or output == "NOT_PLAYING":
             return None
 
@@ -338,19 +909,17 @@ def get_current_song() -> Optional[SongData]:
         except (ValueError, IndexError):
             return None
 
-        song_data = SongData(
-            title=parts[0].strip(),
-            artist=parts[1].strip(),
-            album=parts[2].strip(),
-            duration=duration,
-            position=position,
-        )
-
         # Add URL if available (6th part)
-        if len(parts) >= 6 and parts[5].strip():
-            song_data.url = parts[5].strip()
-
-        return song_data
+        url = parts[5].strip() if len(parts) >= 6 else ""
+
+        return (
+            parts[0].strip(),
+            parts[1].strip(),
+            parts[2].strip(),
+            duration,
+            position,
+            url,
+        )
 
     except (
         subprocess.CalledProcessError,
@@ -365,6 +934,32 @@ def get_current_song() -> Optional[SongData]:
     return None
 
 
+def _song_from_raw(raw: RawSong) -> Optional[SongData]:
+    """Build a validated SongData from a raw song"""
+    title, artist, album, duration, position, url = raw
+    try:
+        return SongData(
+            title=title,
+            artist=artist,
+            album=album,
+            duration=duration,
+            position=position,
+            url=url or None,
+        )
+    except ValueError:
+        return None
+
+
+def get_current_song(
+    session: Optional[AppleScriptSession] = None,
+) -> Optional[SongData]:
+    """Get currently playing song from Apple Music"""
+    # Kept as the public one-shot helper; main() polls _raw_song() directly so it
+    # can reuse the SongData it already built while the track is unchanged
+    raw = _raw_song(session)
+    return _song_from_raw(raw) if raw else None
+
+
 def main() -> None:
     # Your Discord application ID
     CLIENT_ID = "1410325920039960657"
@@ -379,69 +974,141 @@ def main() -> None:
         print("Failed to connect to Discord")
         return
 
+    session = song_session()
+    _lookup_cache.open()
+
     last_was_playing: Optional[bool] = None
-    last_song_info: Optional[str] = None
+    song_start: float = 0.0
+    activity: Optional[Dict[str, Any]] = None
+    activity_key: Optional[Tuple[Any, ...]] = None
+    song: Optional[SongData] = None
+    song_identity: Optional[Tuple[str, str, str]] = None
+    last_song_identity: Optional[Tuple[str, str, str]] = None
+    last_album_info: Optional[str] = None
     cached_artwork: Optional[str] = None
+    apple_music_url: str = "https://music.apple.com/"
+
+    # Network lookups run off the polling thread; results are picked up when ready.
+    # The second worker lets a new song's lookup start while a superseded one is
+    # still finishing, instead of queueing behind it
+    executor = ThreadPoolExecutor(max_workers=2)
+    metadata_future: Optional[Future] = None
 
     try:
         while True:
-            song = get_current_song()
+            # Reconnect if Discord restarted or the connection was dropped
+            if not discord.connected:
+                discord.connect()
+            discord.drain_pending()
+
+            # Only build and validate a new SongData when the track changes
+            raw = _raw_song(session)
+            if raw is None:
+                song = None
+            elif song is None or raw[:3] != song_identity:
+                song = _song_from_raw(raw)
+                song_identity = raw[:3]
+            else:
+                song.position = min(max(raw[4], 0.0), song.duration)
 
             if song:
                 # Check if song changed
-                current_song_info = f"{song.artist}-{song.title}"
-                if current_song_info != last_song_info:
-                    cached_artwork = get_album_artwork(
-                        song.artist, song.title, song.album
+                song_changed = song_identity != last_song_identity
+                if song_changed:
+                    # Keep the current artwork while the album stays the same
+                    current_album_info = f"{song.artist}-{song.album}"
+                    if current_album_info != last_album_info:
+                        cached_artwork = None
+                        last_album_info = current_album_info
+
+                    # Use real Apple Music URL if available, otherwise use iTunes Search API
+                    apple_music_url = song.url or _apple_music_search_url(
+                        song.artist, song.title
                     )
-                    last_song_info = current_song_info
-
-                # Use real Apple Music URL if available, otherwise use iTunes Search API
-                apple_music_url = song.url or get_apple_music_url(
-                    song.artist, song.title, song.album
+                    metadata_future = executor.submit(
+                        fetch_song_metadata, song.artist, song.title, song.album
+                    )
+                    last_song_identity = song_identity
+
+                # Pick up the lookup once it has finished; superseded ones were replaced
+                if metadata_future is not None and metadata_future.done():
+                    found_url, found_artwork = metadata_future.result()
+                    metadata_future = None
+                    apple_music_url = song.url or found_url
+                    cached_artwork = found_artwork or cached_artwork
+
+                # Anchor timestamps once per song; re-anchor only after a seek
+                now = time.time()
+                if (
+                    song_changed
+                    or abs(now - song_start - song.position) > SEEK_TOLERANCE
+                ):
+                    song_start = now - song.position
+                start_time = int(song_start)
+                end_time = int(song_start + song.duration)
+
+                # Rebuild the activity only when something in it changed
+                current_activity_key = (
+                    song.title,
+                    song.artist,
+                    song.album,
+                    start_time,
+                    end_time,
+                    apple_music_url,
+                    cached_artwork,
                 )
+                if current_activity_key != activity_key:
+                    activity = {
+                        "type": 2,  # ActivityType.Listening
+                        "name": "Apple Music",  # Explicit app name
+                        "details": song.title,
+                        "state": f"by {song.artist}",
+                        "timestamps": {
+                            "start": start_time,
+                            "end": end_time,
+                        },
+                        "buttons": [
+                            {"label": "Listen on Apple Music", "url": apple_music_url}
+                        ],
+                    }
 
-                current_time = int(time.time())
-                start_time = current_time - int(song.position)
-                end_time = current_time + int(song.duration - song.position)
-
-                activity: Dict[str, Any] = {
-                    "type": 2,  # ActivityType.Listening
-                    "name": "Apple Music",  # Explicit app name
-                    "details": song.title,
-                    "state": f"by {song.artist}",
-                    "timestamps": {
-                        "start": start_time,
-                        "end": end_time,
-                    },
-                    "buttons": [
-                        {"label": "Listen on Apple Music", "url": apple_music_url}
-                    ],
-                }
+                    # Add album artwork if found
+                    if cached_artwork:
+                        activity["assets"] = {
+                            "large_image": cached_artwork,
+                            "large_text": f"{song.album} by {song.artist}",
+                        }
 
-                # Add album artwork if found
-                if cached_artwork:
-                    activity["assets"] = {
-                        "large_image": cached_artwork,
-                        "large_text": f"{song.album} by {song.artist}",
-                    }
+                    activity_key = current_activity_key
 
                 discord.set_activity(activity)
                 last_was_playing = True
 
+                # Sleep until the track should end, or the heartbeat if sooner
+                sleep_time = min(POLL_HEARTBEAT, song.duration - song.position + 0.5)
+                if metadata_future is not None:
+                    sleep_time = min(sleep_time, POLL_INTERVAL)
+                sleep_time = max(0.5, sleep_time)
+
             else:
                 # No song playing - clear activity once
                 if last_was_playing is not False:
                     discord.set_activity(None)  # Clear activity
                     last_was_playing = False
 
-            time.sleep(1)
+                # Poll quickly so the next track is picked up promptly
+                sleep_time = POLL_INTERVAL
+
+            time.sleep(sleep_time)
 
     except KeyboardInterrupt:
         print("\nShutting down...")
     except Exception as e:
         print(f"Unexpected error: {e}")
     finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        session.close()
+        _lookup_cache.close()
         discord.set_activity(None)  # Clear on exit
         discord.close()
 